@@ -139,6 +139,8 @@ DDL = [
       END IF;
     END$$;
     """,
+    # letters-only team name; backs the schedule import's fuzzy team match ("St. Thomas" == "St Thomas")
+    "CREATE INDEX IF NOT EXISTS idx_team_name_letters ON Team ((regexp_replace(upper(TeamName), '[^A-Z]', '', 'g')));",
     # Additional indexes (IF NOT EXISTS is supported)
     "CREATE INDEX IF NOT EXISTS idx_team_teamID ON Team(TeamID);",
     "CREATE INDEX IF NOT EXISTS idx_teamaddress_teamID ON TeamAddress(TeamID);",
@@ -148,6 +150,8 @@ DDL = [
     "CREATE INDEX IF NOT EXISTS idx_game_homeTeamID ON Game(HomeTeamID);",
     "CREATE INDEX IF NOT EXISTS idx_game_awayTeamID ON Game(AwayTeamID);",
     "CREATE INDEX IF NOT EXISTS idx_game_seasonID ON Game(SeasonID);",
+    # natural key of a game; conflict target for the schedule import's upsert
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_game_natural_key ON Game(SeasonID, GameDate, HomeTeamID, AwayTeamID);",
     "CREATE INDEX IF NOT EXISTS idx_gameplays_gameID ON GamePlays(GameID);",
     "CREATE INDEX IF NOT EXISTS idx_gameplays_playerID ON GamePlays(PlayerID);",
     "CREATE INDEX IF NOT EXISTS idx_gameplays_teamID ON GamePlays(TeamID);",
@@ -1,8 +1,28 @@
-import os, re, datetime
-from io import BytesIO
+import os, re, json, datetime, shutil, tempfile
 import boto3, pg8000
-
-s3 = boto3.client("s3")
+from botocore.config import Config
+from operator import itemgetter
+from functools import lru_cache
+
+# openpyxl comes from a Lambda layer: import once per cold start, fail only when an .xlsx arrives
+try:
+    from openpyxl import load_workbook, __version__ as _OPENPYXL_VERSION
+    _OPENPYXL_OK = True
+except ImportError:
+    _OPENPYXL_OK = False
+
+# Module scope on purpose: warm invocations reuse the client's pooled connections + TLS sessions
+s3 = boto3.client("s3", config=Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"mode": "standard", "max_attempts": 3},
+))
+
+# VERBOSE=1 turns on step-by-step diagnostics (headers, samples, cache sizes, connect/close)
+VERBOSE = os.environ.get("VERBOSE") == "1"
+
+_CANON_RE = re.compile(r'[^a-z0-9]')
+_WS_RE = re.compile(r"\s+")
 
 # =========================
 # Filename parsing (STRICT)
@@ -35,7 +55,7 @@ def parse_filename_game_stats(key: str):
     else:
         raise ValueError("Bad filename: must end with '_GameStats' (or '_Game_Stats')")
 
-    team_name = " ".join(team_tokens).replace("-", " ").strip().replace("  ", " ")
+    team_name = _WS_RE.sub(" ", " ".join(team_tokens).replace("-", " ")).strip()
     if not team_name:
         raise ValueError("Bad filename: team name missing between GameID and _GameStats")
 
@@ -44,27 +64,53 @@ def parse_filename_game_stats(key: str):
 # =======================
 # Read Excel (.xlsx only)
 # =======================
-def read_gamestats_sheet_from_s3(bucket: str, key: str):
+# S3 bodies up to this size stay in RAM; larger workbooks spill to /tmp
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+def spool_s3_object(bucket: str, key: str):
+    """Stream an S3 object into a rewound SpooledTemporaryFile (no full in-memory bytes copy)."""
     obj = s3.get_object(Bucket=bucket, Key=key)
-    data = obj["Body"].read()
-    print(f"⬇️  Downloaded {len(data)} bytes from s3://{bucket}/{key}")
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    shutil.copyfileobj(obj["Body"], body)
+    size = body.tell()
+    body.seek(0)
+    print(f"⬇️  Downloaded {size} bytes from s3://{bucket}/{key}")
+    return body
+
+def rows_as_tuples(headers, it):
+    """
+    Keep data rows as tuples with one slot per header (padded/truncated), dropping blank rows.
+    Callers read cells by column index (see column_getter) instead of building a dict per row.
+    """
+    n = len(headers)
+    named = [i for i, h in enumerate(headers) if h]
+    out = []
+    for row in it:
+        if len(row) != n:
+            row = (tuple(row) + (None,) * n)[:n]
+        if any(row[i] is not None and str(row[i]).strip() != "" for i in named):
+            out.append(row)
+    return out
+
+def read_gamestats_sheet_from_s3(bucket: str, key: str, header_index):
+    """
+    Return ({key: column index}, rows); `header_index` maps the raw header row to expected keys.
+    """
+    body = spool_s3_object(bucket, key)
 
     if not key.lower().endswith(".xlsx"):
         raise RuntimeError("Only .xlsx supported for Game Stats (workbook with multiple tabs)")
 
-    print("📘 Detected Excel (.xlsx); importing openpyxl…")
-    try:
-        from openpyxl import load_workbook, __version__ as oxv
-        print(f"✅ openpyxl imported (v{oxv}); loading workbook…")
-    except ImportError:
+    if not _OPENPYXL_OK:
         raise RuntimeError("openpyxl not available; attach the 'openpyxl' layer to this function")
+    if VERBOSE: print(f"📘 Detected Excel (.xlsx); loading workbook (openpyxl v{_OPENPYXL_VERSION})…")
 
-    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    wb = load_workbook(body, read_only=True, data_only=True)
 
     # Find the "Game Stats" sheet (case/spacing tolerant)
     target = None
     for ws in wb.worksheets:
-        nm = (ws.title or "").strip().lower().replace("  ", " ")
+        nm = _WS_RE.sub(" ", (ws.title or "").lower()).strip()
         if nm == "game stats" or nm.replace(" ", "") == "gamestats":
             target = ws
             break
@@ -74,55 +120,62 @@ def read_gamestats_sheet_from_s3(bucket: str, key: str):
     it = target.iter_rows(values_only=True)
     headers_row = next(it)
     headers = [str(h).strip() if h is not None else "" for h in headers_row]
-    print(f"🧭 Header columns: {headers}")
+    if VERBOSE: print(f"🧭 Header columns: {headers}")
 
-    out = []
-    for row in it:
-        rec = {}
-        for i, val in enumerate(row):
-            if i < len(headers) and headers[i]:
-                rec[headers[i]] = val
-        if any(v is not None and str(v).strip() != "" for v in rec.values()):
-            out.append(rec)
+    out = rows_as_tuples(headers, it)
     print(f"✅ Parsed {len(out)} rows from 'Game Stats'")
-    return out
+
+    # Resolve header names once here so rows never need a second normalization pass
+    idx = header_index(headers)
+    if VERBOSE:
+        for i, sample in enumerate(out[:2]):
+            print(f"🔍 Sample after normalize #{i+1}: { {k: sample[j] for k, j in idx.items()} }")
+    return idx, out
 
 # =================
 # Value normalizers
 # =================
+@lru_cache(maxsize=256)
 def _canon(k: str) -> str:
-    return re.sub(r'[^a-z0-9]', '', (k or '').strip().lower())
-
-def normalize_headers(rows):
+    return _CANON_RE.sub('', (k or '').strip().lower())
+
+# _canon(header) -> expected key (_canon strips punctuation, so no '#'/'()' variants)
+_HEADER_CANON_MAP = {
+    "playno": "Play No",        "play": "Play No",
+    "playerno": "Player No",    "player": "Player No",
+    "stataction": "Stat Action", "action": "Stat Action", "actionname": "Stat Action",
+    "stattype": "Stat Type",    "type": "Stat Type",
+    "istd": "IsTD",             "td": "IsTD",
+    "issafety": "IsSafety",     "safety": "IsSafety",
+    "yardsa": "Yards (A)",      "yarda": "Yards (A)",     "ga": "Yards (A)",
+    "yardsb": "Yards (B)",      "yardb": "Yards (B)",     "gb": "Yards (B)",
+    "yardsc": "Yards (C)",      "sign": "Yards (C)",      "gc": "Yards (C)",
+    "notes": "Notes",           "remark": "Notes",        "comments": "Notes",
+}
+
+def normalize_headers(headers):
     """
     Map flexible human headers to our expected keys:
       Play No | Player No | Stat Action | Stat Type | IsTD | IsSafety | Yards (A) | Yards (B) | Yards (C) | Notes
+    Returns {key: column index}; unmapped headers keep their own name.
     """
-    if not rows: return rows
     mapping = {}
-    for h in rows[0].keys():
-        ck = _canon(h)
-        if ck in ("playno","play","play#"):                mapping[h] = "Play No"
-        elif ck in ("playerno","player","player#"):        mapping[h] = "Player No"
-        elif ck in ("stataction","action","actionname"):   mapping[h] = "Stat Action"
-        elif ck in ("stattype","type"):                    mapping[h] = "Stat Type"
-        elif ck in ("istd","td"):                          mapping[h] = "IsTD"
-        elif ck in ("issafety","safety"):                  mapping[h] = "IsSafety"
-        elif ck in ("yardsa","yards(a)","yarda","ga"):     mapping[h] = "Yards (A)"
-        elif ck in ("yardsb","yards(b)","yardb","gb"):     mapping[h] = "Yards (B)"
-        elif ck in ("yardsc","yards(c)","sign","gc"):      mapping[h] = "Yards (C)"
-        elif ck in ("notes","remark","comments"):          mapping[h] = "Notes"
-    out = []
-    for r in rows:
-        nr = {}
-        for k, v in r.items():
-            nr[mapping.get(k, k)] = v
-        out.append(nr)
-    print(f"🧩 Header mapping: { {k:v for k,v in mapping.items()} }")
-    for i, sample in enumerate(out[:2]):
-        print(f"🔍 Sample after normalize #{i+1}: {sample}")
-    return out
-
+    idx = {}
+    for i, h in enumerate(headers):
+        if not h: continue
+        target = _HEADER_CANON_MAP.get(_canon(h))
+        if target: mapping[h] = target
+        idx[target or h] = i
+    if VERBOSE: print(f"🧩 Header mapping: { {k:v for k,v in mapping.items()} }")
+    return idx
+
+def column_getter(idx, name):
+    """row -> value of column `name` (always None when the sheet lacks that column)."""
+    i = idx.get(name)
+    return itemgetter(i) if i is not None else (lambda row: None)
+
+# typed: 7, 7.0 and "7" are cached separately (all map to "7")
+@lru_cache(maxsize=512, typed=True)
 def clean_jersey_text(val):
     if val is None: return None
     s = str(val).strip()
@@ -133,33 +186,40 @@ def clean_jersey_text(val):
     except Exception:
         return s
 
+_TRUE_SET = frozenset({"1","true","t","yes","y","x","✓","check","checked"})
+
 def to_bool(v):
-    if v is None: return False
-    s = str(v).strip().lower()
-    return s in ("1","true","t","yes","y","x","✓","check","checked")
+    # openpyxl hands back real bools/numbers for most cells; skip the string work for those
+    if isinstance(v, bool): return v
+    if isinstance(v, (int, float)): return v != 0
+    return False if v is None else (str(v).strip().lower() in _TRUE_SET)
 
-def calculate_yards(row):
+# Exact 'Yards (C)' literals that mean "negate"; anything else starting with 'neg' still counts
+_SIGN_NEG = frozenset({"negative", "neg", "-", "−"})
+
+def calculate_yards(yards_a, yards_b, yards_c):
     """
     Sum 'Yards (A)' + 'Yards (B)' and apply sign per 'Yards (C)'.
     - Treat missing A/B as 0
-    - 'Yards (C)': 'negative' → negate; anything else → positive
+    - 'Yards (C)': 'negative' / 'neg' / '-' → negate; anything else → positive
     - Return TEXT
     """
     def to_num(x):
+        if isinstance(x, (int, float)):
+            return float(x)
+        if x is None:                      # blank cell: no exception round-trip
+            return 0.0
         try:
             return float(x)
         except Exception:
             return 0.0
-    a = to_num(row.get("Yards (A)"))
-    b = to_num(row.get("Yards (B)"))
-    sign = (str(row.get("Yards (C)") or "").strip().lower())
-    total = a + b
-    if sign.startswith("neg"):
-        total = -total
-    try:
-        return str(int(total))
-    except Exception:
-        return str(int(round(total)))
+    total = to_num(yards_a) + to_num(yards_b)
+    if yards_c is not None:
+        sign = str(yards_c).strip().lower()
+        if sign in _SIGN_NEG or sign.startswith("neg"):
+            total = -total
+    # int() already truncates floats; its only failures (inf/nan) fail for round() too
+    return str(int(total))
 
 def sack_weight_for(action_name: str) -> float:
     if not action_name: return 0.0
@@ -203,46 +263,62 @@ def get_team_id_or_fail(cur, team_name: str):
 
 def build_roster_map(cur, team_id: int):
     """
-    Return dict {(team_id_str, jersey_str) -> player_id}
+    Return dict {jersey_str -> player_id} for one team (the query already filters TeamID).
     Only current rows (EndDate='9999-12-31').
     """
     cur.execute("""
-        SELECT PlayerID, TeamID, JerseyNumber
+        SELECT PlayerID, JerseyNumber
           FROM TeamRoster
          WHERE TeamID=%s AND EndDate='9999-12-31'
     """, (team_id,))
     out = {}
-    for pid, tid, jersey in cur.fetchall():
-        key = (str(tid), clean_jersey_text(jersey))
-        out[key] = pid
-    print(f"👕 Active roster rows cached for TeamID={team_id}: {len(out)}")
+    for pid, jersey in cur.fetchall():
+        out[clean_jersey_text(jersey)] = pid
+    if VERBOSE: print(f"👕 Active roster rows cached for TeamID={team_id}: {len(out)}")
     return out
 
 def build_stataction_map(cur):
-    """Return dict {lower(ActionName): StatActionID}"""
+    """Return dict {casefold(ActionName): StatActionID}"""
     cur.execute("SELECT StatActionID, ActionName FROM StatAction")
-    out = {}
-    for sid, name in cur.fetchall():
-        out[(name or "").strip().lower()] = sid
-    print(f"📚 StatAction entries cached: {len(out)}")
+    out = {name.strip().casefold(): sid for sid, name in cur.fetchall() if name}
+    if VERBOSE: print(f"📚 StatAction entries cached: {len(out)}")
     return out
 
 def delete_existing_gameplays(cur, game_id: int):
-    cur.execute("SELECT COUNT(*) FROM GamePlays WHERE GameID=%s", (game_id,))
-    before = cur.fetchone()[0]
     cur.execute("DELETE FROM GamePlays WHERE GameID=%s", (game_id,))
+    before = cur.rowcount
     print(f"🧹 Deleted {before} existing GamePlays for GameID={game_id}")
 
-def insert_gameplay(cur, game_id, play_no, player_id, team_id, stat_type, stat_action_id,
-                    yards, is_td, is_safety, sack_weight, source_file_name, notes):
-    cur.execute("""
+# JSON array param -> text[] in element order (JSON null -> NULL, any string stays text)
+_JSON_TEXT_ARRAY = ("ARRAY(SELECT e FROM json_array_elements_text(CAST(%s AS json))"
+                    " WITH ORDINALITY AS j(e, n) ORDER BY n)")
+
+def insert_gameplays(cur, game_id, team_id, source_file_name, play_nos, player_ids,
+                     stat_types, action_ids, yards, is_tds, is_safeties, sack_weights, notes):
+    """
+    Insert all GamePlays for one file with a single statement: each column travels as
+    one array parameter (equal-length lists) and is unnested server-side, so Postgres
+    parses/plans the INSERT once per file regardless of row count.
+    Free-text columns go as JSON: pg8000's array literals leave 'null'/'Null' unquoted,
+    which Postgres would read as NULL.
+    """
+    if not play_nos: return
+    cur.execute(f"""
         INSERT INTO GamePlays (
             GameID, PlayNo, PlayerID, TeamID, StatType, StatActionID,
             Yards, IsTD, IsSafety, SackWeight, SourceFileName, CreatedAt, Notes
         )
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s, now(), %s)
-    """, (game_id, play_no, player_id, team_id, stat_type, stat_action_id,
-          yards, is_td, is_safety, sack_weight, source_file_name, notes))
+        SELECT %s, p.PlayNo, p.PlayerID, %s, p.StatType, p.StatActionID,
+               p.Yards, p.IsTD, p.IsSafety, p.SackWeight, %s, now(), p.Notes
+          FROM unnest(
+                 CAST(%s AS integer[]), CAST(%s AS text[]),    {_JSON_TEXT_ARRAY},
+                 CAST(%s AS integer[]), CAST(%s AS text[]),    CAST(%s AS boolean[]),
+                 CAST(%s AS boolean[]), CAST(%s AS numeric[]), {_JSON_TEXT_ARRAY}
+               ) AS p(PlayNo, PlayerID, StatType, StatActionID, Yards,
+                      IsTD, IsSafety, SackWeight, Notes)
+    """, (game_id, team_id, source_file_name,
+          play_nos, player_ids, json.dumps(stat_types), action_ids, yards,
+          is_tds, is_safeties, sack_weights, json.dumps(notes)))
 
 # =========
 # Handler
@@ -267,17 +343,25 @@ def lambda_handler(event, context):
         raise
 
     # Read rows from 'Game Stats' tab
-    rows = read_gamestats_sheet_from_s3(bucket, key)
-    rows = normalize_headers(rows)
+    idx, rows = read_gamestats_sheet_from_s3(bucket, key, normalize_headers)
+    get_play_no     = column_getter(idx, "Play No")
+    get_player_no   = column_getter(idx, "Player No")
+    get_stat_action = column_getter(idx, "Stat Action")
+    get_stat_type   = column_getter(idx, "Stat Type")
+    get_is_td       = column_getter(idx, "IsTD")
+    get_is_safety   = column_getter(idx, "IsSafety")
+    get_yards_a     = column_getter(idx, "Yards (A)")
+    get_yards_b     = column_getter(idx, "Yards (B)")
+    get_yards_c     = column_getter(idx, "Yards (C)")
+    get_notes       = column_getter(idx, "Notes")
 
     # Hard filter: keep ONLY rows with a valid Play No (no evaluation of others)
     total_rows = len(rows)
     filtered = []
     for r in rows:
-        pn = parse_play_no(r.get("Play No"))
+        pn = parse_play_no(get_play_no(r))
         if pn is not None:
-            r["_PlayNoInt"] = pn  # cache parsed int
-            filtered.append(r)
+            filtered.append((pn, r))  # keep parsed int alongside the row
     dropped = total_rows - len(filtered)
     rows = filtered
     print(f"🧹 Dropped {dropped} rows without a valid 'Play No' (kept {len(rows)} of {total_rows})")
@@ -285,13 +369,16 @@ def lambda_handler(event, context):
         raise RuntimeError("No valid rows with 'Play No' found in 'Game Stats'")
 
     # DB
-    print("🔌 Connecting to database…")
+    if VERBOSE: print("🔌 Connecting to database…")
     conn = get_conn()
-    print("✅ Database connection established")
+    if VERBOSE: print("✅ Database connection established")
 
     inserted = skipped = 0
     try:
         with conn.cursor() as cur:
+            # file stays in S3 and the import is idempotent (delete + reinsert), so a lost
+            # tail on crash is acceptable; only affects this transaction
+            cur.execute("SET LOCAL synchronous_commit = off")
             team_id = get_team_id_or_fail(cur, team_name)
             print(f"📎 Using TeamID={team_id}")
 
@@ -301,45 +388,54 @@ def lambda_handler(event, context):
             # wipe existing stats for this game
             delete_existing_gameplays(cur, game_id)
 
-            # process & insert
-            for r in rows:
-                play_no = r["_PlayNoInt"]           # validated int
-                jersey  = clean_jersey_text(r.get("Player No"))
-                action  = (r.get("Stat Action") or "").strip()
-                stat_type = (r.get("Stat Type") or "").strip() or None
+            # pass 1: resolve IDs and drop unusable rows (needs per-row dict lookups)
+            kept, play_nos, player_ids, stat_types, action_ids, action_keys = [], [], [], [], [], []
+            missing_jerseys, unknown_actions = set(), set()   # reported once after the loop
+            for play_no, r in rows:                 # play_no: validated int
+                jersey     = clean_jersey_text(get_player_no(r))
+                action_raw = get_stat_action(r)
+                action     = action_raw.strip() if action_raw else ""
 
                 if jersey is None or not action:
                     skipped += 1
                     continue
 
-                player_id = roster_map.get((str(team_id), jersey))
+                player_id = roster_map.get(jersey)
                 if not player_id:
-                    print(f"⚠️  Skip: no PlayerID for jersey {jersey}")
+                    missing_jerseys.add(jersey)
                     skipped += 1
                     continue
 
-                action_id = action_map.get(action.strip().lower())
+                action_key = action.casefold()
+                action_id = action_map.get(action_key)
                 if not action_id:
-                    print(f"⚠️  Skip: unknown StatAction '{action}'")
+                    unknown_actions.add(action)
                     skipped += 1
                     continue
 
-                yards = calculate_yards(r)
-                is_td = to_bool(r.get("IsTD"))
-                is_safety = to_bool(r.get("IsSafety"))
-                sack_weight = sack_weight_for(action)
-                notes = r.get("Notes")
-
-                try:
-                    insert_gameplay(
-                        cur, game_id, play_no, player_id, team_id,
-                        stat_type, action_id, yards, is_td, is_safety,
-                        sack_weight, key, notes
-                    )
-                    inserted += 1
-                except Exception as e:
-                    print(f"⛔ Insert failed for PlayNo={play_no}: {e}")
-                    skipped += 1
+                stat_type_raw = get_stat_type(r)
+                stat_type = (stat_type_raw.strip() or None) if stat_type_raw else None
+
+                kept.append(r)
+                play_nos.append(play_no)
+                player_ids.append(player_id)
+                stat_types.append(stat_type)
+                action_ids.append(action_id)
+                action_keys.append(action_key)
+
+            if missing_jerseys: print(f"⚠️  Skipped rows: no PlayerID for jerseys {sorted(missing_jerseys)}")
+            if unknown_actions: print(f"⚠️  Skipped rows: unknown StatActions {sorted(unknown_actions)}")
+
+            # pass 2: derived columns, built one column at a time as the lists the array INSERT takes
+            yards        = list(map(calculate_yards, map(get_yards_a, kept), map(get_yards_b, kept), map(get_yards_c, kept)))
+            is_tds       = list(map(to_bool, map(get_is_td, kept)))
+            is_safeties  = list(map(to_bool, map(get_is_safety, kept)))
+            sack_weights = list(map(sack_weight_for, action_keys))
+            notes        = [None if n is None else str(n) for n in map(get_notes, kept)]  # sent as a JSON text array
+
+            insert_gameplays(cur, game_id, team_id, key, play_nos, player_ids, stat_types,
+                             action_ids, yards, is_tds, is_safeties, sack_weights, notes)
+            inserted = len(kept)
 
             print(f"🧾 Committing (inserted={inserted}, skipped={skipped})")
             conn.commit()
@@ -361,4 +457,4 @@ def lambda_handler(event, context):
         except Exception:
             pass
         conn.close()
-        print("🔒 DB connection closed")
+        if VERBOSE: print("🔒 DB connection closed")
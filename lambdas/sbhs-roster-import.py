@@ -1,8 +1,29 @@
-import os, io, csv, re, datetime
-from io import BytesIO
+import os, csv, re, codecs, datetime, shutil, tempfile
 import boto3, pg8000
-
-s3 = boto3.client("s3")
+from botocore.config import Config
+from operator import itemgetter
+from functools import lru_cache
+
+# openpyxl comes from a Lambda layer: import once per cold start, fail only when an .xlsx arrives
+try:
+    from openpyxl import load_workbook, __version__ as _OPENPYXL_VERSION
+    _OPENPYXL_OK = True
+except ImportError:
+    _OPENPYXL_OK = False
+
+# Module scope on purpose: warm invocations reuse the client's pooled connections + TLS sessions
+s3 = boto3.client("s3", config=Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"mode": "standard", "max_attempts": 3},
+))
+
+# VERBOSE=1 turns on step-by-step diagnostics (headers, samples, cache sizes, connect/close)
+VERBOSE = os.environ.get("VERBOSE") == "1"
+
+_CANON_RE = re.compile(r'[^a-z0-9]')
+_LETTERS_RE = re.compile(r"[^A-Za-z]")
+_WS_RE = re.compile(r"\s+")
 
 # ---------- strict filename parsing ----------
 def parse_filename_meta_strict(key):
@@ -18,7 +39,7 @@ def parse_filename_meta_strict(key):
             roster_idx = i
     if roster_idx is None or roster_idx <= 1:
         raise ValueError('Bad filename: must include a final "_Roster" segment')
-    team = " ".join(parts[1:roster_idx]).replace("-", " ").strip()
+    team = _WS_RE.sub(" ", " ".join(parts[1:roster_idx]).replace("-", " ")).strip()
     if not team:
         raise ValueError("Bad filename: team name missing between year and _Roster")
     if not (2000 <= season <= 2100):
@@ -26,42 +47,71 @@ def parse_filename_meta_strict(key):
     return season, team
 
 # ---------- file readers ----------
-def read_rows_from_s3(bucket, key):
+# S3 bodies up to this size stay in RAM; larger workbooks spill to /tmp
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+def spool_s3_object(bucket: str, key: str):
+    """Stream an S3 object into a rewound SpooledTemporaryFile (no full in-memory bytes copy)."""
     obj = s3.get_object(Bucket=bucket, Key=key)
-    data = obj["Body"].read()
-    print(f"⬇️  Downloaded {len(data)} bytes from s3://{bucket}/{key}")
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    shutil.copyfileobj(obj["Body"], body)
+    size = body.tell()
+    body.seek(0)
+    print(f"⬇️  Downloaded {size} bytes from s3://{bucket}/{key}")
+    return body
+
+def rows_as_tuples(headers, it):
+    """
+    Keep data rows as tuples with one slot per header (padded/truncated), dropping blank rows.
+    Callers read cells by column index (see column_getter) instead of building a dict per row.
+    """
+    n = len(headers)
+    named = [i for i, h in enumerate(headers) if h]
+    out = []
+    for row in it:
+        if len(row) != n:
+            row = (tuple(row) + (None,) * n)[:n]
+        if any(row[i] is not None and str(row[i]).strip() != "" for i in named):
+            out.append(row)
+    return out
+
+def read_rows_from_s3(bucket, key, header_index):
+    """
+    Return ({key: column index}, rows); `header_index` maps the raw header row to expected keys.
+    """
+    body = spool_s3_object(bucket, key)
 
     if key.lower().endswith(".csv"):
-        print("📄 Detected CSV; parsing…")
-        text = data.decode("utf-8")
-        rows = list(csv.DictReader(io.StringIO(text)))
+        if VERBOSE:
+            print("📄 Detected CSV; parsing…")
+        reader = csv.reader(codecs.iterdecode(body, "utf-8"))
+        headers = [h.strip() for h in next(reader, [])]
+        rows = rows_as_tuples(headers, reader)
         print(f"✅ Parsed {len(rows)} rows from CSV")
-        return rows
-
-    if key.lower().endswith(".xlsx"):
-        print("📘 Detected Excel (.xlsx); importing openpyxl…")
-        try:
-            from openpyxl import load_workbook, __version__ as oxv
-            print(f"✅ openpyxl imported (v{oxv}); loading workbook…")
-        except ImportError:
+
+    elif key.lower().endswith(".xlsx"):
+        if not _OPENPYXL_OK:
             raise RuntimeError("openpyxl not available; attach the 'openpyxl' layer to this function")
-        wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+        if VERBOSE:
+            print(f"📘 Detected Excel (.xlsx); loading workbook (openpyxl v{_OPENPYXL_VERSION})…")
+        wb = load_workbook(body, read_only=True, data_only=True)
         ws = wb.active
         it = ws.iter_rows(values_only=True)
         headers = [str(h).strip() if h is not None else "" for h in next(it)]
-        print(f"🧭 Header columns: {headers}")
-        out = []
-        for row in it:
-            rec = {}
-            for i, val in enumerate(row):
-                if i < len(headers) and headers[i]:
-                    rec[headers[i]] = val
-            if any(v is not None and str(v).strip() != "" for v in rec.values()):
-                out.append(rec)
-        print(f"✅ Parsed {len(out)} rows from Excel")
-        return out
-
-    raise RuntimeError(f"Unsupported file type: {key}")
+        if VERBOSE:
+            print(f"🧭 Header columns: {headers}")
+        rows = rows_as_tuples(headers, it)
+        print(f"✅ Parsed {len(rows)} rows from Excel")
+
+    else:
+        raise RuntimeError(f"Unsupported file type: {key}")
+
+    # Resolve header names once here so rows never need a second normalization pass
+    idx = header_index(headers)
+    if VERBOSE:
+        for i, sample in enumerate(rows[:2]):
+            print(f"🔍 Sample after normalize #{i+1}: { {k: sample[j] for k, j in idx.items()} }")
+    return idx, rows
 
 # ---------- value cleaning ----------
 def strip_value(v):
@@ -98,10 +148,27 @@ def normalize_jersey_text(v):
         return s if s else None
 
 # ---------- header normalization (NEW) ----------
+@lru_cache(maxsize=256)
 def _canon(k: str) -> str:
-    return re.sub(r'[^a-z0-9]', '', (k or '').strip().lower())
-
-def normalize_headers(rows):
+    return _CANON_RE.sub('', (k or '').strip().lower())
+
+# _canon(header) -> expected key (_canon strips punctuation, so no '#'/'_' variants)
+_HEADER_CANON_MAP = {
+    "no": "JerseyNumber", "number": "JerseyNumber", "jersey": "JerseyNumber",
+    "jerseynumber": "JerseyNumber", "uniform": "JerseyNumber",
+    "firstname": "FirstName", "first": "FirstName",
+    "lastname": "LastName", "last": "LastName", "surname": "LastName",
+    "class": "GraduationYear", "gradyear": "GraduationYear", "graduationyear": "GraduationYear",
+    "heightin": "Height", "height": "Height", "ht": "Height", "heightinches": "Height",
+    "weight": "Weight", "wt": "Weight",
+    "position1": "PositionID1", "pos1": "PositionID1",
+    "position2": "PositionID2", "pos2": "PositionID2",
+    "position3": "PositionID3", "pos3": "PositionID3",
+    # Compatibility with old "Position" single field:
+    "position": "PositionID1", "pos": "PositionID1", "positionid": "PositionID1",
+}
+
+def normalize_headers(headers):
     """
     Map new sheet:
       No -> JerseyNumber
@@ -112,44 +179,25 @@ def normalize_headers(rows):
       Weight -> Weight
       Position 1/2/3 -> PositionID1/2/3
     Also keeps legacy-friendly inputs.
+    Returns {key: column index}.
     """
-    if not rows:
-        return rows
     mapping = {}
-    for h in rows[0].keys():
-        ck = _canon(h)
-        if ck in ("no", "number", "jersey", "jerseynumber", "jersey#", "uniform"):
-            mapping[h] = "JerseyNumber"
-        elif ck in ("firstname", "first", "first_name"):
-            mapping[h] = "FirstName"
-        elif ck in ("lastname", "last", "last_name", "surname"):
-            mapping[h] = "LastName"
-        elif ck in ("class", "gradyear", "graduationyear"):
-            mapping[h] = "GraduationYear"
-        elif ck in ("heightin", "height", "ht", "heightinches"):
-            mapping[h] = "Height"
-        elif ck in ("weight", "wt"):
-            mapping[h] = "Weight"
-        elif ck in ("position1", "pos1"):
-            mapping[h] = "PositionID1"
-        elif ck in ("position2", "pos2"):
-            mapping[h] = "PositionID2"
-        elif ck in ("position3", "pos3"):
-            mapping[h] = "PositionID3"
-        # Compatibility with old "Position" single field:
-        elif ck in ("position", "pos", "positionid"):
-            mapping[h] = "PositionID1"
-        # else keep original
-    out = []
-    for r in rows:
-        nr = {}
-        for k, v in r.items():
-            nr[mapping.get(k, k)] = v
-        out.append(nr)
-    print(f"🧩 Header mapping: { {k: v for k,v in mapping.items()} }")
-    for i, sample in enumerate(out[:2]):
-        print(f"🔍 Sample after normalize #{i+1}: {sample}")
-    return out
+    idx = {}
+    for i, h in enumerate(headers):
+        if not h:
+            continue
+        target = _HEADER_CANON_MAP.get(_canon(h))
+        if target:
+            mapping[h] = target
+        idx[target or h] = i  # else keep original
+    if VERBOSE:
+        print(f"🧩 Header mapping: { {k: v for k,v in mapping.items()} }")
+    return idx
+
+def column_getter(idx, name):
+    """row -> value of column `name` (always None when the sheet lacks that column)."""
+    i = idx.get(name)
+    return itemgetter(i) if i is not None else (lambda row: None)
 
 # ---------- DB helpers ----------
 def get_conn():
@@ -179,7 +227,7 @@ def get_season_id_or_fail(cur, year):
 def letters_only_upper(text):
     if not text:
         return ""
-    return re.sub(r"[^A-Za-z]", "", str(text)).upper()
+    return _LETTERS_RE.sub("", str(text)).upper()
 
 def build_player_id_base(first_name, last_name):
     last_letters  = letters_only_upper(last_name)
@@ -188,38 +236,77 @@ def build_player_id_base(first_name, last_name):
     first_two = (first_letters + "XX")[:2]
     return last_four + first_two
 
-def get_next_available_suffix(cur, base):
-    cur.execute("SELECT PlayerID FROM Players WHERE PlayerID LIKE %s", (base + "__",))
-    rows = cur.fetchall()
-    taken = {row[0][-2:] for row in rows} if rows else set()
+def get_next_available_suffix(base_to_taken, base):
+    """Pick the lowest free 2-digit suffix for `base` and reserve it in base_to_taken."""
+    taken = base_to_taken.setdefault(base, set())
     for i in range(1, 100):
         nn = f"{i:02d}"
         if nn not in taken:
+            taken.add(nn)
             return nn
     raise RuntimeError(f"No available suffix for base {base}")
 
-def resolve_player_id(cur, first_name, last_name):
+def load_player_index(cur):
+    """
+    One scan of Players, replacing the per-row name/ID/suffix lookups. Returns
+      name_to_pids:  {(UPPER(FirstName), UPPER(LastName)) -> [PlayerID, ...]}
+      pid_names:     {PlayerID -> (UPPER(FirstName), UPPER(LastName))}  (keys = existing players)
+      base_to_taken: {6-char base -> {2-digit suffix, ...}}
+    """
+    cur.execute("SELECT PlayerID, FirstName, LastName FROM Players")
+    name_to_pids = {}
+    pid_names = {}
+    base_to_taken = {}
+    for pid, fn, ln in cur.fetchall():
+        key = ((fn or "").upper(), (ln or "").upper())
+        name_to_pids.setdefault(key, []).append(pid)
+        pid_names[pid] = key
+        if len(pid) == 8:
+            base_to_taken.setdefault(pid[:6], set()).add(pid[6:])
+    if VERBOSE:
+        print(f"👥 Players cached: {len(pid_names)}")
+    return name_to_pids, pid_names, base_to_taken
+
+def index_player_name(name_to_pids, pid_names, player_id, first_name, last_name):
+    """
+    Keep the cache in step with the queued Players writes: file player_id under its new name
+    (moving it off the old one when an update renames the player), as a re-query would see it.
+    """
+    key = ((first_name or "").upper(), (last_name or "").upper())
+    old = pid_names.get(player_id)
+    if old == key:
+        return
+    if old is not None:
+        name_to_pids[old].remove(player_id)
+    matches = name_to_pids.setdefault(key, [])
+    if player_id not in matches:    # resolve_player_id already files the IDs it allocates
+        matches.append(player_id)
+    pid_names[player_id] = key
+
+def resolve_player_id(name_to_pids, base_to_taken, first_name, last_name):
     """
     New rule without DOB:
     - If exactly one Player row exists for (FirstName, LastName), reuse it.
     - Else allocate a new ID with base + next suffix.
+    Newly allocated IDs are added to name_to_pids so later rows see them.
     """
-    cur.execute("""
-        SELECT PlayerID
-          FROM Players
-         WHERE UPPER(FirstName)=UPPER(%s) AND UPPER(LastName)=UPPER(%s)
-    """, (first_name or "", last_name or ""))
-    matches = cur.fetchall()
-    if matches and len(matches) == 1:
-        return matches[0][0]
+    matches = name_to_pids.setdefault(((first_name or "").upper(), (last_name or "").upper()), [])
+    if len(matches) == 1:
+        return matches[0]
     base = build_player_id_base(first_name, last_name)
-    return base + get_next_available_suffix(cur, base)
-
-def insert_or_update_player(cur, player_id, first_name, last_name, height_in, weight_lb, graduation_year):
-    cur.execute("SELECT 1 FROM Players WHERE PlayerID=%s", (player_id,))
-    exists = cur.fetchone() is not None
-    if exists:
-        cur.execute("""
+    player_id = base + get_next_available_suffix(base_to_taken, base)
+    matches.append(player_id)
+    return player_id
+
+def flush_players(cur, inserts, updates):
+    """Write queued Players rows: inserts first, then updates in sheet order."""
+    if inserts:
+        cur.executemany("""
+            INSERT INTO Players (PlayerID, FirstName, LastName, Height, Weight, GraduationYear)
+            VALUES (%s,%s,%s,%s,%s,%s)
+        """, inserts)
+    if updates:
+        cur.executemany("""
             UPDATE Players
                SET FirstName=%s,
                    LastName=%s,
@@ -227,19 +314,18 @@ def insert_or_update_player(cur, player_id, first_name, last_name, height_in, we
                    Weight=%s,
                    GraduationYear=%s
              WHERE PlayerID=%s
-        """, (first_name, last_name, height_in, weight_lb, graduation_year, player_id))
-    else:
-        cur.execute("""
-            INSERT INTO Players (PlayerID, FirstName, LastName, Height, Weight, GraduationYear)
-            VALUES (%s,%s,%s,%s,%s,%s)
-        """, (player_id, first_name, last_name, height_in, weight_lb, graduation_year))
+        """, updates)
 
-def valid_position(cur, pos_id):
+def load_valid_positions(cur):
+    """Position is a small static lookup; read it once per run."""
+    cur.execute("SELECT PositionID FROM Position")
+    return {row[0] for row in cur.fetchall()}
+
+def valid_position(valid_positions, pos_id):
     pos_id = (str(pos_id).strip().upper() if pos_id is not None else None)
     if not pos_id:
         return None
-    cur.execute("SELECT 1 FROM Position WHERE PositionID=%s", (pos_id,))
-    return pos_id if cur.fetchone() else None
+    return pos_id if pos_id in valid_positions else None
 
 def upsert_roster_three_positions(cur, team_id, season_id, player_id, jersey_number,
                                   p1, p2, p3):
@@ -282,18 +368,30 @@ def lambda_handler(event, context):
         print(f"❌ Filename error: {e}")
         return {"ok": False, "bucket": bucket, "key": key, "error": str(e)}
 
-    rows = read_rows_from_s3(bucket, key)
-    rows = normalize_headers(rows)
+    idx, rows = read_rows_from_s3(bucket, key, normalize_headers)
     if not rows:
         print("⚠️  No data rows found (empty file).")
         return {"ok": False, "bucket": bucket, "key": key, "error": "Empty file or no readable rows"}
 
+    get_first_name  = column_getter(idx, "FirstName")
+    get_last_name   = column_getter(idx, "LastName")
+    get_jersey      = column_getter(idx, "JerseyNumber")
+    get_height      = column_getter(idx, "Height")
+    get_weight      = column_getter(idx, "Weight")
+    get_grad_year   = column_getter(idx, "GraduationYear")
+    get_position1   = column_getter(idx, "PositionID1")
+    get_position2   = column_getter(idx, "PositionID2")
+    get_position3   = column_getter(idx, "PositionID3")
+    get_player_id   = column_getter(idx, "PlayerID")
+
     processed = 0
     skipped = 0
 
-    print("🔌 Connecting to database…")
+    if VERBOSE:
+        print("🔌 Connecting to database…")
     conn = get_conn()
-    print("✅ Database connection established")
+    if VERBOSE:
+        print("✅ Database connection established")
 
     try:
         with conn.cursor() as cur:
@@ -301,31 +399,47 @@ def lambda_handler(event, context):
             season_id = get_season_id_or_fail(cur, season_year)
             print(f"📎 Using TeamID={team_id}, SeasonID={season_id}")
 
+            valid_positions = load_valid_positions(cur)
+            name_to_pids, pid_names, base_to_taken = load_player_index(cur)
+            player_inserts, player_updates, roster_rows = [], [], []
+
             for r in rows:
                 # Required names
-                first_name = strip_value(r.get("FirstName"))
-                last_name  = strip_value(r.get("LastName"))
+                first_name = strip_value(get_first_name(r))
+                last_name  = strip_value(get_last_name(r))
                 if not first_name or not last_name:
                     skipped += 1
                     continue
 
-                jersey = normalize_jersey_text(r.get("JerseyNumber"))
-                height_in = safe_to_int(r.get("Height"))            # already inches in the new sheet
-                weight_lb = safe_to_int(r.get("Weight"))
-                graduation_year = safe_to_int(r.get("GraduationYear"))
+                jersey = normalize_jersey_text(get_jersey(r))
+                height_in = safe_to_int(get_height(r))            # already inches in the new sheet
+                weight_lb = safe_to_int(get_weight(r))
+                graduation_year = safe_to_int(get_grad_year(r))
 
                 # Positions (validate against Position table)
-                p1 = valid_position(cur, normalize_position_code(r.get("PositionID1")))
-                p2 = valid_position(cur, normalize_position_code(r.get("PositionID2")))
-                p3 = valid_position(cur, normalize_position_code(r.get("PositionID3")))
+                p1 = valid_position(valid_positions, normalize_position_code(get_position1(r)))
+                p2 = valid_position(valid_positions, normalize_position_code(get_position2(r)))
+                p3 = valid_position(valid_positions, normalize_position_code(get_position3(r)))
 
                 # Allocate/reuse PlayerID (no DOB now)
-                player_id = r.get("PlayerID")
+                player_id = get_player_id(r)
                 if not player_id:
-                    player_id = resolve_player_id(cur, first_name, last_name)
-
-                # Upsert player, then roster (with 3 positions)
-                insert_or_update_player(cur, player_id, first_name, last_name, height_in, weight_lb, graduation_year)
+                    player_id = resolve_player_id(name_to_pids, base_to_taken, first_name, last_name)
+
+                # Queue player upsert; roster rows wait until Players are written (FK)
+                if player_id in pid_names:
+                    player_updates.append((first_name, last_name, height_in, weight_lb, graduation_year, player_id))
+                else:
+                    player_inserts.append((player_id, first_name, last_name, height_in, weight_lb, graduation_year))
+                    if len(player_id) == 8:  # sheet-supplied IDs also claim their suffix
+                        base_to_taken.setdefault(player_id[:6], set()).add(player_id[6:])
+                index_player_name(name_to_pids, pid_names, player_id, first_name, last_name)
+                roster_rows.append((player_id, jersey, p1, p2, p3))
+
+            flush_players(cur, player_inserts, player_updates)
+
+            # Roster (with 3 positions)
+            for player_id, jersey, p1, p2, p3 in roster_rows:
                 upsert_roster_three_positions(cur, team_id, season_id, player_id, jersey, p1, p2, p3)
                 processed += 1
 
@@ -333,7 +447,8 @@ def lambda_handler(event, context):
         conn.commit()
     finally:
         conn.close()
-        print("🔒 DB connection closed")
+        if VERBOSE:
+            print("🔒 DB connection closed")
 
     return {
         "ok": True,
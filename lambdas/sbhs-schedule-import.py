@@ -1,8 +1,28 @@
-import os, io, csv, re, datetime
-from io import BytesIO
+import os, io, csv, re, json, codecs, datetime, shutil, tempfile
 import boto3, pg8000
-
-s3 = boto3.client("s3")
+from botocore.config import Config
+from operator import itemgetter
+from functools import lru_cache
+from itertools import chain, islice
+
+# openpyxl comes from a Lambda layer: import once per cold start, fail only when an .xlsx arrives
+try:
+    from openpyxl import load_workbook, __version__ as _OPENPYXL_VERSION
+    _OPENPYXL_OK = True
+except ImportError:
+    _OPENPYXL_OK = False
+
+# Module scope on purpose: warm invocations reuse the client's pooled connections + TLS sessions
+s3 = boto3.client("s3", config=Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"mode": "standard", "max_attempts": 3},
+))
+
+# VERBOSE=1 turns on step-by-step diagnostics (headers, samples, cache sizes, connect/close)
+VERBOSE = os.environ.get("VERBOSE") == "1"
+
+_CANON_RE = re.compile(r'[^a-z0-9]')
 
 # =========================
 # Filename parsing (STRICT)
@@ -33,44 +53,69 @@ def parse_schedule_filename_strict(key: str) -> int:
 # =======================
 # Read CSV / Excel (.xlsx)
 # =======================
-def read_rows_from_s3(bucket: str, key: str):
+# S3 bodies up to this size stay in RAM; larger workbooks spill to /tmp
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+def spool_s3_object(bucket: str, key: str):
+    """Stream an S3 object into a rewound SpooledTemporaryFile (no full in-memory bytes copy)."""
     obj = s3.get_object(Bucket=bucket, Key=key)
-    data = obj["Body"].read()
-    print(f"⬇️  Downloaded {len(data)} bytes from s3://{bucket}/{key}")
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    shutil.copyfileobj(obj["Body"], body)
+    size = body.tell()
+    body.seek(0)
+    print(f"⬇️  Downloaded {size} bytes from s3://{bucket}/{key}")
+    return body
+
+def iter_rows_as_tuples(headers, it):
+    """
+    Lazily yield data rows as tuples with one slot per header (padded/truncated), skipping blank rows.
+    Callers read cells by column index (see column_getter) instead of building a dict per row.
+    """
+    n = len(headers)
+    named = [i for i, h in enumerate(headers) if h]
+    for row in it:
+        if len(row) != n:
+            row = (tuple(row) + (None,) * n)[:n]
+        if any(row[i] is not None and str(row[i]).strip() != "" for i in named):
+            yield row
+
+def read_rows_from_s3(bucket: str, key: str, header_index):
+    """
+    Return ({key: column index}, row iterator); `header_index` maps the raw header row to expected keys.
+    Rows are produced lazily from the spooled body, so the caller should consume them exactly once.
+    """
+    body = spool_s3_object(bucket, key)
 
     if key.lower().endswith(".csv"):
-        print("📄 Detected CSV; parsing…")
-        text = data.decode("utf-8")
-        rows = list(csv.DictReader(io.StringIO(text)))
-        print(f"✅ Parsed {len(rows)} rows from CSV")
-        return rows
-
-    if key.lower().endswith(".xlsx"):
-        print("📘 Detected Excel (.xlsx); importing openpyxl…")
-        try:
-            from openpyxl import load_workbook, __version__ as oxv
-            print(f"✅ openpyxl imported (v{oxv}); loading workbook…")
-        except ImportError:
+        if VERBOSE: print("📄 Detected CSV; parsing…")
+        reader = csv.reader(codecs.iterdecode(body, "utf-8"))
+        headers = [h.strip() for h in next(reader, [])]
+        rows = iter_rows_as_tuples(headers, reader)
+
+    elif key.lower().endswith(".xlsx"):
+        if not _OPENPYXL_OK:
             raise RuntimeError("openpyxl not available; attach the 'openpyxl' layer to this function")
-        wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+        if VERBOSE: print(f"📘 Detected Excel (.xlsx); loading workbook (openpyxl v{_OPENPYXL_VERSION})…")
+        wb = load_workbook(body, read_only=True, data_only=True)
         ws = wb.active
         it = ws.iter_rows(values_only=True)
 
         headers = [str(h).strip() if h is not None else "" for h in next(it)]
-        print(f"🧭 Header columns: {headers}")
+        if VERBOSE: print(f"🧭 Header columns: {headers}")
 
-        out = []
-        for row in it:
-            rec = {}
-            for i, val in enumerate(row):
-                if i < len(headers) and headers[i]:
-                    rec[headers[i]] = val
-            if any(v is not None and str(v).strip() != "" for v in rec.values()):
-                out.append(rec)
-        print(f"✅ Parsed {len(out)} rows from Excel")
-        return out
+        rows = iter_rows_as_tuples(headers, it)
 
-    raise RuntimeError(f"Unsupported file type: {key}")
+    else:
+        raise RuntimeError(f"Unsupported file type: {key}")
+
+    # Resolve header names once here so rows never need a second normalization pass
+    idx = header_index(headers)
+    if VERBOSE:
+        head = list(islice(rows, 2))
+        for i, sample in enumerate(head):
+            print(f"🔍 Sample after normalize #{i+1}: { {k: sample[j] for k, j in idx.items()} }")
+        rows = chain(head, rows)
+    return idx, rows
 
 # =================
 # Value normalizers
@@ -108,118 +153,202 @@ def to_iso_date(v):
 # ==========================
 # Header normalization (flex)
 # ==========================
+@lru_cache(maxsize=256)
 def _canon(k: str) -> str:
-    return re.sub(r'[^a-z0-9]', '', (k or '').strip().lower())
-
-def normalize_schedule_headers(rows):
-    if not rows: return rows
+    return _CANON_RE.sub('', (k or '').strip().lower())
+
+# _canon(header) -> expected key (_canon strips punctuation, so no '_' variants)
+_HEADER_CANON_MAP = {
+    "weekno": "Week No",      "week": "Week No",     "wk": "Week No",
+    "date": "Date",           "gamedate": "Date",
+    "location": "Location",   "venue": "Location",   "field": "Location",
+    "awayteam": "Away Team",  "away": "Away Team",   "visitor": "Away Team",
+    "hometeam": "Home Team",  "home": "Home Team",
+    "awayscore": "Away Score",
+    "homescore": "Home Score",
+}
+
+def normalize_schedule_headers(headers):
+    """Returns {key: column index}; unmapped headers keep their own name."""
     mapping = {}
-    for h in rows[0].keys():
-        ck = _canon(h)
-        if ck in ("weekno","week","wk"):            mapping[h] = "Week No"
-        elif ck in ("date","gamedate","game_date"): mapping[h] = "Date"
-        elif ck in ("location","venue","field"):    mapping[h] = "Location"
-        elif ck in ("awayteam","away","visitor"):   mapping[h] = "Away Team"
-        elif ck in ("hometeam","home"):             mapping[h] = "Home Team"
-        elif ck in ("awayscore","away_score"):      mapping[h] = "Away Score"
-        elif ck in ("homescore","home_score"):      mapping[h] = "Home Score"
-    out = []
-    for r in rows:
-        nr = {}
-        for k, v in r.items():
-            nr[mapping.get(k, k)] = v
-        out.append(nr)
-    print(f"🧩 Header mapping: { {k:v for k,v in mapping.items()} }")
-    for i, sample in enumerate(out[:2]):
-        print(f"🔍 Sample after normalize #{i+1}: {sample}")
-    return out
+    idx = {}
+    for i, h in enumerate(headers):
+        if not h: continue
+        target = _HEADER_CANON_MAP.get(_canon(h))
+        if target: mapping[h] = target
+        idx[target or h] = i
+    if VERBOSE: print(f"🧩 Header mapping: { {k:v for k,v in mapping.items()} }")
+    return idx
+
+def column_getter(idx, name):
+    """row -> value of column `name` (always None when the sheet lacks that column)."""
+    i = idx.get(name)
+    return itemgetter(i) if i is not None else (lambda row: None)
 
 # ============
 # DB utilities
 # ============
+# Read once per cold start; a missing variable fails the init phase instead of the first event
+_DB_HOST = os.environ["DB_HOST"]
+_DB_NAME = os.environ["DB_NAME"]
+_DB_USER = os.environ["DB_USER"]
+_DB_PASS = os.environ["DB_PASS"]
+_DB_PORT = int(os.environ.get("DB_PORT", "5432"))
+
 def get_conn():
     return pg8000.connect(
-        host=os.environ["DB_HOST"],
-        database=os.environ["DB_NAME"],
-        user=os.environ["DB_USER"],
-        password=os.environ["DB_PASS"],
-        port=int(os.environ.get("DB_PORT", "5432")),
+        host=_DB_HOST,
+        database=_DB_NAME,
+        user=_DB_USER,
+        password=_DB_PASS,
+        port=_DB_PORT,
         timeout=10
     )
 
-def get_season_id_or_fail(cur, year: int) -> int:
-    cur.execute("SELECT SeasonID FROM Season WHERE Year=%s", (year,))
-    row = cur.fetchone()
-    if not row:
-        raise RuntimeError(f"Season {year} not found. Create it first.")
-    return row[0]
+# Cached across warm invocations; a dead socket (e.g. NAT idle timeout) is replaced on the next event
+_CONN = None
 
-def ensure_team_exists(cur, team_name: str) -> int | None:
+def _get_or_reconnect():
+    """Return the cached connection if it still answers SELECT 1, otherwise open and cache a new one."""
+    global _CONN
+    if _CONN is not None:
+        try:
+            with _CONN.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            return _CONN
+        except Exception as e:
+            print(f"♻️  Cached DB connection unusable ({e}); reconnecting…")
+            try: _CONN.close()
+            except Exception: pass
+            _CONN = None
+    _CONN = get_conn()
+    _PREPARED.clear()   # server-side statements died with the old session
+    return _CONN
+
+# {sql: pg8000 PreparedStatement} for _CONN; parsed/planned once, reused by warm invocations
+_PREPARED = {}
+
+def prepared(conn, sql: str):
+    """Return the named prepared statement for `sql` (pg8000 :name params), preparing it on first use."""
+    ps = _PREPARED.get(sql)
+    if ps is None:
+        ps = _PREPARED[sql] = conn.prepare(sql)
+    return ps
+
+SEASON_ID_SQL = "SELECT SeasonID FROM Season WHERE Year = :year"
+
+def get_season_id_or_fail(conn, year: int) -> int:
+    rows = prepared(conn, SEASON_ID_SQL).run(year=year)
+    if not rows:
+        raise RuntimeError(f"Season {year} not found. Create it first.")
+    return rows[0][0]
+
+# Whole team resolution in one statement:
+#   numeric -> verified only (we do NOT create by ID)
+#   name    -> case-insensitive match, then letters-only match ("St. Thomas" == "St Thomas";
+#              lowest TeamID wins), else INSERTed. Spellings that only differ in punctuation/case
+#              share one new team. ON CONFLICT relies on idx_team_name_lower (sbhs-db-migrate).
+# :names is a JSON array: pg8000's array literals leave 'null'/'Null' unquoted, which Postgres
+# would read as NULL (and the Team insert would then fail NOT NULL).
+RESOLVE_TEAMS_SQL = """
+    WITH input AS (
+        SELECT DISTINCT name, lower(name) AS lname,
+               regexp_replace(upper(name), '[^A-Z]', '', 'g') AS letters
+          FROM json_array_elements_text(CAST(:names AS json)) AS i(name)
+    ),
+    exact AS (
+        SELECT i.name, t.TeamID
+          FROM input i JOIN Team t ON lower(t.TeamName) = i.lname
+    ),
+    fuzzy AS (
+        -- only for names the exact (idx_team_name_lower) match missed
+        SELECT DISTINCT ON (i.name) i.name, t.TeamID
+          FROM input i JOIN Team t ON regexp_replace(upper(t.TeamName), '[^A-Z]', '', 'g') = i.letters
+         WHERE NOT EXISTS (SELECT 1 FROM exact e WHERE e.name = i.name)
+         ORDER BY i.name, t.TeamID
+    ),
+    matched AS (
+        SELECT name, TeamID FROM exact UNION ALL SELECT name, TeamID FROM fuzzy
+    ),
+    unmatched AS (
+        SELECT i.* FROM input i WHERE NOT EXISTS (SELECT 1 FROM matched m WHERE m.name = i.name)
+    ),
+    created AS (
+        INSERT INTO Team (TeamName)
+        SELECT DISTINCT ON (letters) name FROM unmatched ORDER BY letters, name
+        ON CONFLICT (lower(TeamName)) DO NOTHING
+        RETURNING TeamID, TeamName
+    )
+    SELECT 'id', CAST(TeamID AS text), TeamID FROM Team WHERE TeamID = ANY(CAST(:ids AS integer[]))
+    UNION ALL
+    SELECT 'matched', name, TeamID FROM matched
+    UNION ALL
+    SELECT 'created', TeamName, TeamID FROM created
+    UNION ALL
+    SELECT 'new', u.name, c.TeamID
+      FROM unmatched u JOIN created c ON regexp_replace(upper(c.TeamName), '[^A-Z]', '', 'g') = u.letters
+"""
+
+def resolve_team_ids(conn, values) -> dict:
     """
-    Find TeamID by name (case-insensitive). If not found, INSERT and return new TeamID.
-    (If a numeric TeamID is provided elsewhere, we do NOT create by ID.)
+    Map raw Home/Away cell values to TeamIDs (one round-trip, see RESOLVE_TEAMS_SQL).
+    Unknown numeric IDs are left out of the result.
     """
-    if not team_name: return None
-    name_clean = str(team_name).strip()
-    if not name_clean: return None
-
-    # Case-insensitive exact match
-    cur.execute("SELECT TeamID FROM Team WHERE lower(TeamName)=lower(%s) LIMIT 1", (name_clean,))
-    row = cur.fetchone()
-    if row: return row[0]
-
-    # Fallback letters-only comparison (e.g., "St. Thomas" == "St Thomas")
-    target = re.sub(r"[^A-Za-z]", "", name_clean).upper()
-    cur.execute("SELECT TeamID, TeamName FROM Team")
-    for tid, tname in cur.fetchall():
-        if re.sub(r"[^A-Za-z]", "", (tname or "")).upper() == target:
-            return tid
-
-    # Not found → create
-    cur.execute("INSERT INTO Team(TeamName) VALUES (%s) RETURNING TeamID", (name_clean,))
-    new_id = cur.fetchone()[0]
-    print(f"🆕 Created Team '{name_clean}' (TeamID={new_id})")
-    return new_id
-
-def resolve_team_id_from_value(cur, value):
+    ids = [int(v) for v in values if v.isdigit()]
+    names = [v for v in values if not v.isdigit()]
+    out, found_ids, created = {}, set(), []
+    for kind, name, tid in prepared(conn, RESOLVE_TEAMS_SQL).run(names=json.dumps(names), ids=ids):
+        if kind == "id": found_ids.add(tid)
+        elif kind == "created": created.append(f"{name} (TeamID={tid})")
+        else: out[name] = tid
+    if created: print(f"🆕 Created {len(created)} teams: {created}")
+    out.update({v: int(v) for v in values if v.isdigit() and int(v) in found_ids})
+    return out
+
+# Games are staged with COPY (no per-row bind/parse), then merged by one set-based upsert.
+# Dropped at COMMIT; a rollback discards it too, so a reused connection never sees a stale copy.
+CREATE_TMP_GAMES_SQL = """
+    CREATE TEMP TABLE tmp_games (
+        GameDate    TEXT,
+        HomeTeamID  INTEGER,
+        AwayTeamID  INTEGER,
+        WeekNumber  INTEGER,
+        Location    TEXT
+    ) ON COMMIT DROP
+"""
+
+# The conflict target is the unique index idx_game_natural_key (created by sbhs-db-migrate);
+# blank Week No / Location cells never overwrite stored values. INSERT ... ON CONFLICT rather
+# than MERGE: works on every supported Postgres and RETURNING gives the inserted/updated split.
+UPSERT_GAMES_SQL = """
+    INSERT INTO Game (SeasonID, GameDate, HomeTeamID, AwayTeamID, WeekNumber, Location, HomeScore, AwayScore)
+    SELECT :season_id, t.GameDate, t.HomeTeamID, t.AwayTeamID, t.WeekNumber, t.Location, 0, 0
+      FROM tmp_games t
+    ON CONFLICT (SeasonID, GameDate, HomeTeamID, AwayTeamID) DO UPDATE
+       SET WeekNumber = COALESCE(EXCLUDED.WeekNumber, Game.WeekNumber),
+           Location   = COALESCE(EXCLUDED.Location, Game.Location)
+    RETURNING (xmax = 0) AS inserted
+"""
+
+def upsert_games(conn, cur, season_id, games) -> tuple[int, int]:
     """
-    If value is numeric -> verify exists (no creation by ID).
-    If value is a name   -> ensure_team_exists (creates if missing).
+    games: {(game_date_iso, home_team_id, away_team_id): (week_number, location_text)}
+    Keys must be unique (one statement can't touch the same row twice). Returns (inserted, updated).
     """
-    if value is None: return None
-    txt = str(value).strip()
-    if not txt: return None
-    if txt.isdigit():
-        cur.execute("SELECT TeamID FROM Team WHERE TeamID=%s", (int(txt),))
-        row = cur.fetchone()
-        return row[0] if row else None
-    return ensure_team_exists(cur, txt)
-
-def find_existing_game(cur, season_id, game_date_iso, home_team_id, away_team_id):
-    cur.execute("""
-        SELECT GameID FROM Game
-         WHERE SeasonID=%s AND GameDate=%s AND HomeTeamID=%s AND AwayTeamID=%s
-    """, (season_id, game_date_iso, home_team_id, away_team_id))
-    r = cur.fetchone()
-    return r[0] if r else None
-
-def insert_or_update_game(cur, season_id, game_date_iso, home_team_id, away_team_id,
-                          week_number, location_text):
-    gid = find_existing_game(cur, season_id, game_date_iso, home_team_id, away_team_id)
-    if gid:
-        sets, vals = [], []
-        if week_number is not None: sets.append("WeekNumber=%s"); vals.append(week_number)
-        if location_text is not None: sets.append("Location=%s");  vals.append(location_text)
-        if sets:
-            sql = f"UPDATE Game SET {', '.join(sets)} WHERE GameID=%s"
-            cur.execute(sql, (*vals, gid))
-        return "updated"
-
-    cur.execute("""
-        INSERT INTO Game (SeasonID, GameDate, HomeTeamID, AwayTeamID, WeekNumber, Location, HomeScore, AwayScore)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-    """, (season_id, game_date_iso, home_team_id, away_team_id, week_number, location_text, 0, 0))
-    return "inserted"
+    if not games: return 0, 0
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    for (game_date_iso, home_team_id, away_team_id), (week_number, location_text) in games.items():
+        w.writerow((game_date_iso, home_team_id, away_team_id, week_number, location_text))  # None -> NULL
+    buf.seek(0)
+
+    cur.execute(CREATE_TMP_GAMES_SQL)
+    cur.execute("COPY tmp_games (GameDate, HomeTeamID, AwayTeamID, WeekNumber, Location) "
+                "FROM STDIN WITH (FORMAT csv)", stream=buf)
+    rows = prepared(conn, UPSERT_GAMES_SQL).run(season_id=season_id)
+    inserted = sum(1 for (was_insert,) in rows if was_insert)
+    return inserted, len(games) - inserted
 
 # =========
 # Handler
@@ -243,68 +372,84 @@ def lambda_handler(event, context):
         raise
 
     # Read & normalize
-    rows = read_rows_from_s3(bucket, key)
-    rows = normalize_schedule_headers(rows)
-    if not rows:
+    idx, rows = read_rows_from_s3(bucket, key, normalize_schedule_headers)
+    get_date      = column_getter(idx, "Date")
+    get_away_team = column_getter(idx, "Away Team")
+    get_home_team = column_getter(idx, "Home Team")
+    get_week_no   = column_getter(idx, "Week No")
+    get_location  = column_getter(idx, "Location")
+
+    inserted = updated = skipped = 0
+
+    # Single pass: normalize each row once, collecting the teams of rows that describe a game.
+    # Teams are keyed case-insensitively (first spelling seen is the one sent to the DB), so
+    # "South Broward" / "south broward" resolve once and the game loop is plain dict lookups.
+    parsed, unique_teams = [], {}
+    for r in rows:
+        game_date_iso = to_iso_date(get_date(r))
+        away_name     = strip_value(get_away_team(r))
+        home_name     = strip_value(get_home_team(r))
+        if not game_date_iso or not away_name or not home_name:
+            skipped += 1
+            continue
+        away_key, home_key = away_name.lower(), home_name.lower()
+        parsed.append((game_date_iso, away_key, home_key,
+                       safe_to_int(get_week_no(r)), strip_value(get_location(r))))
+        unique_teams.setdefault(away_key, away_name)
+        unique_teams.setdefault(home_key, home_name)
+    if not parsed and not skipped:
         print("⚠️  No data rows found.")
         raise RuntimeError("Empty file or no readable rows")
+    print(f"✅ Parsed {len(parsed) + skipped} rows ({len(parsed)} with a date and both teams)")
 
-    # DB
-    print("🔌 Connecting to database…")
-    conn = get_conn()
-    print("✅ Database connection established")
-
-    inserted = updated = skipped = 0
+    # DB (only once the key, filename and sheet have all been validated)
+    if VERBOSE: print("🔌 Connecting to database…")
+    conn = _get_or_reconnect()
+    if VERBOSE: print("✅ Database connection established")
 
+    committed = False
     try:
         with conn.cursor() as cur:
+            # file stays in S3 and the import is an idempotent upsert, so re-running the same key
+            # recovers a lost tail on crash; only affects this transaction
+            cur.execute("SET LOCAL synchronous_commit = off")
+
             # Season must exist
-            season_id = get_season_id_or_fail(cur, season_year)
+            season_id = get_season_id_or_fail(conn, season_year)
             print(f"📎 Using SeasonID={season_id}")
 
-            # Pre-resolve (and create) all named teams
-            unique_teams = set()
-            for r in rows:
-                av = strip_value(r.get("Away Team"))
-                hv = strip_value(r.get("Home Team"))
-                if av: unique_teams.add(av)
-                if hv: unique_teams.add(hv)
-
+            # Resolve (and create) all named teams
+            resolved = resolve_team_ids(conn, sorted(unique_teams.values()))
             team_id_map = {}
-            for name in unique_teams:
-                tid = resolve_team_id_from_value(cur, name)
-                if tid is None:
+            for team_key, name in unique_teams.items():
+                if name not in resolved:
                     # numeric ID referenced but doesn't exist
                     raise RuntimeError(f"Team ID reference '{name}' not found. Create it or use the team name.")
-                team_id_map[name] = tid
-
-            # Process games
-            for r in rows:
-                game_date_iso = to_iso_date(r.get("Date"))
-                away_name     = strip_value(r.get("Away Team"))
-                home_name     = strip_value(r.get("Home Team"))
-                if not game_date_iso or not away_name or not home_name:
-                    skipped += 1
-                    continue
-
-                week_number   = safe_to_int(r.get("Week No"))
-                location_text = strip_value(r.get("Location"))
-                away_team_id  = team_id_map.get(away_name)
-                home_team_id  = team_id_map.get(home_name)
-                if away_team_id is None or home_team_id is None:
-                    skipped += 1
-                    continue
-
-                result = insert_or_update_game(
-                    cur, season_id, game_date_iso, home_team_id, away_team_id,
-                    week_number, location_text
-                )
-                if result == "inserted": inserted += 1
-                elif result == "updated": updated += 1
-                else: skipped += 1
+                team_id_map[team_key] = resolved[name]
+
+            # Process games: one entry per natural key; a repeated row behaves like a second
+            # upsert of the same game (non-blank cells win) and is counted as an update
+            games = {}
+            for game_date_iso, away_key, home_key, week_number, location_text in parsed:
+                away_team_id = team_id_map[away_key]
+                home_team_id = team_id_map[home_key]
+                gkey = (game_date_iso, home_team_id, away_team_id)
+                prev = games.get(gkey)
+                if prev is not None:
+                    updated += 1
+                    if week_number is None:   week_number = prev[0]
+                    if location_text is None: location_text = prev[1]
+                games[gkey] = (week_number, location_text)
+
+            # the write phase is a fixed three statements (temp table, COPY, upsert) regardless of
+            # file size, so there is nothing left to pipeline
+            n_ins, n_upd = upsert_games(conn, cur, season_id, games)
+            inserted += n_ins
+            updated  += n_upd
 
             print(f"🧾 Committing (inserted={inserted}, updated={updated}, skipped={skipped})")
             conn.commit()
+            committed = True
 
         return {
             "ok": True,
@@ -314,9 +459,9 @@ def lambda_handler(event, context):
         }
 
     finally:
-        try:
-            conn.rollback()
-        except Exception:
-            pass
-        conn.close()
-        print("🔒 DB connection closed")
+        # only needed when we bailed out mid-transaction; keeps the reused connection clean
+        if not committed:
+            try:
+                conn.rollback()
+            except Exception:
+                pass